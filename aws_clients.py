@@ -0,0 +1,44 @@
+"""
+aws_clients.py
+Process-wide cached boto3 clients shared by ingest and query paths.
+
+Creating a boto3 client builds TLS/session state each time, which is
+expensive on Lambda cold starts and wasteful when embeddings.py and
+query.py each hold their own copy. Every caller goes through `client()`
+so one instance per service exists per process.
+"""
+from __future__ import annotations
+import threading
+import boto3
+from botocore.config import Config as BotoConfig
+from config import Config
+
+# Shared tuning: pool sized for the ingest thread fan-out (default is 10
+# connections, which starves EMBED_CONCURRENCY workers), keepalive so
+# long-lived processes reuse connections, adaptive retries to absorb 429s.
+_BOTO_CFG = BotoConfig(
+    max_pool_connections=64,
+    tcp_keepalive=True,
+    retries={"mode": "adaptive", "max_attempts": 10},
+)
+
+_clients: dict = {}
+_lock = threading.Lock()
+
+def client(service: str):
+    """Return the process-wide cached boto3 client for `service`."""
+    if service not in _clients:
+        with _lock:
+            if service not in _clients:
+                _clients[service] = boto3.client(
+                    service, region_name=Config().region, config=_BOTO_CFG)
+    return _clients[service]
+
+def bedrock_runtime():
+    return client("bedrock-runtime")
+
+def s3():
+    return client("s3")
+
+def textract():
+    return client("textract")
@@ -23,6 +23,14 @@ class Config:
     index_table: str = os.getenv("OPENSEARCH_INDEX_TABLE", "table-index")
     index_image: str = os.getenv("OPENSEARCH_INDEX_IMAGE", "image-index")
 
+    # knn_vector storage: on_disk + compression trades a little recall for a
+    # ~16x smaller memory footprint (Faiss quantization with rescoring)
+    knn_mode: str = os.getenv("OPENSEARCH_KNN_MODE", "on_disk")
+    knn_compression: str = os.getenv("OPENSEARCH_KNN_COMPRESSION", "16x")
+    # "byte" quantizes vectors to int8 client-side (4x fewer bytes on the
+    # wire and on disk); set "float" to store full fp32 vectors instead
+    knn_data_type: str = os.getenv("OPENSEARCH_KNN_DATA_TYPE", "byte")
+
     # Auth mode: either Basic (user/pass) or SigV4 (for AOSS/managed)
     os_user: str | None = os.getenv("OPENSEARCH_BASIC_USER")
     os_pass: str | None = os.getenv("OPENSEARCH_BASIC_PASS")
@@ -30,4 +38,19 @@ class Config:
 
     # --- Bedrock models ---
     bedrock_embed_model: str = os.getenv("BEDROCK_EMBED_MODEL", "amazon.titan-embed-text-v2")
+    # Concurrent Bedrock embedding calls during ingest (bounded by TPS quota)
+    embed_concurrency: int = int(os.getenv("EMBED_CONCURRENCY", "8"))
+
+    # --- Textract (async ingestion) ---
+    # Concurrent StartDocumentAnalysis jobs (bounded by Textract quota)
+    textract_concurrency: int = int(os.getenv("TEXTRACT_CONCURRENCY", "4"))
+    # Optional SNS completion channel; when unset we poll GetDocumentAnalysis
+    textract_sns_topic_arn: str | None = os.getenv("TEXTRACT_SNS_TOPIC_ARN")
+    textract_role_arn: str | None = os.getenv("TEXTRACT_ROLE_ARN")
+    # FeatureTypes requested from Textract. The pipeline never reads
+    # KEY_VALUE_SET blocks, so FORMS (slow and pricey) is off by default;
+    # LAYOUT is cheaper and improves TABLE/FIGURE detection.
+    textract_features: tuple = tuple(
+        f.strip() for f in os.getenv("TEXTRACT_FEATURES", "TABLES,LAYOUT").split(",") if f.strip()
+    )
     bedrock_claude_model: str = os.getenv("BEDROCK_CLAUDE_MODEL", "anthropic.claude-3-sonnet-20240229-v1:0")
@@ -1,47 +1,129 @@
 """
 embeddings.py
 Wrapper for Amazon Bedrock's Titan Embeddings model.
-This module exposes a single function: `embed_text(text)`.
+This module exposes `embed_text(text)` for single strings and
+`embed_texts(texts)` for batch ingestion.
 """
 from __future__ import annotations
+import hashlib
 import json
-import boto3
+import os
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import numpy as np
 from botocore.exceptions import BotoCoreError, ClientError
+from aws_clients import bedrock_runtime
 from config import Config
 
-_bedrock = None
+_cache_conn = None
+_cache_lock = threading.Lock()
 
-def _client():
-    """Return a cached Bedrock runtime client (avoid re-creating per call)."""
-    global _bedrock
-    if _bedrock is None:
-        _bedrock = boto3.client("bedrock-runtime", region_name=Config().region)
-    return _bedrock
+# Semantic near-duplicate cache: per-model probe matrix + cached vectors.
+# Probes are cheap local hashed-trigram vectors, NOT Titan embeddings.
+_PROBE_DIM = 256
+_sem_index: dict[str, dict] = {}
 
-def embed_text(text: str, model_id: str | None = None) -> list[float]:
+def _cos_threshold() -> float:
+    """Cosine similarity needed for a semantic cache hit (>1 disables)."""
+    return float(os.getenv("EMBED_CACHE_COS_THRESHOLD", "0.86"))
+
+def _cache():
+    """Return a cached SQLite connection for the on-disk embedding cache."""
+    global _cache_conn
+    if _cache_conn is None:
+        path = os.getenv("EMBED_CACHE", "embed_cache.sqlite")
+        # embed_texts calls in from worker threads; serialize access via _cache_lock
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS emb(k BLOB PRIMARY KEY, model TEXT, v BLOB, p BLOB)")
+        _cache_conn = conn
+        # Rebuild the in-memory semantic index from prior runs
+        for model, v, p in conn.execute("SELECT model, v, p FROM emb WHERE p IS NOT NULL"):
+            _sem_add(model,
+                     np.frombuffer(p, dtype=np.float32),
+                     np.frombuffer(v, dtype=np.float32))
+    return _cache_conn
+
+def _probe_vec(text: str) -> np.ndarray:
+    """
+    Cheap local proxy vector for near-duplicate detection: hashed character
+    trigram counts, L2-normalized. Stable across processes (crc32, not hash()).
     """
-    Generate an embedding vector for the given text using Titan.
+    vec = np.zeros(_PROBE_DIM, dtype=np.float32)
+    t = " ".join(text.casefold().split())
+    for i in range(len(t) - 2):
+        vec[zlib.crc32(t[i:i + 3].encode()) % _PROBE_DIM] += 1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
 
-    Args:
-        text: Input text (empty text returns an empty vector)
-        model_id: Optional override; defaults to Config().bedrock_embed_model
+def _sem_add(model_id: str, probe: np.ndarray, vec: np.ndarray) -> None:
+    """Register a (probe, vector) pair in the in-memory index. Caller locks."""
+    entry = _sem_index.setdefault(model_id, {"probes": [], "vecs": [], "matrix": None})
+    entry["probes"].append(probe)
+    entry["vecs"].append(vec)
+    entry["matrix"] = None  # invalidate; rebuilt lazily on next lookup
 
-    Returns:
-        A list[float] embedding vector. Titan v2 length is typically 1536.
+def _sem_get(model_id: str, probe: np.ndarray) -> np.ndarray | None:
+    """Return the cached vector whose probe is nearest, if similar enough."""
+    threshold = _cos_threshold()
+    with _cache_lock:
+        entry = _sem_index.get(model_id)
+        if not entry or threshold > 1.0:
+            return None
+        if entry["matrix"] is None:
+            entry["matrix"] = np.stack(entry["probes"])
+        sims = entry["matrix"] @ probe
+        best = int(sims.argmax())
+        if sims[best] >= threshold:
+            return entry["vecs"][best]
+    return None
 
-    Example:
-        >>> embed_text("Hello world")[:5]
-        [0.0123, -0.0456, ...]
+def _cache_key(text: str, model_id: str) -> bytes:
+    return hashlib.sha256(f"{model_id}\0{text}".encode()).digest()
+
+def _cache_get(text: str, model_id: str) -> np.ndarray | None:
+    with _cache_lock:
+        row = _cache().execute(
+            "SELECT v FROM emb WHERE k=?", (_cache_key(text, model_id),)
+        ).fetchone()
+    if row is None:
+        return None
+    return np.frombuffer(row[0], dtype=np.float32)
+
+def _cache_put(text: str, model_id: str, vec: np.ndarray, probe: np.ndarray) -> None:
+    blob = np.asarray(vec, dtype=np.float32).tobytes()
+    with _cache_lock:
+        _cache().execute(
+            "INSERT OR IGNORE INTO emb(k, model, v, p) VALUES (?, ?, ?, ?)",
+            (_cache_key(text, model_id), model_id, blob, probe.tobytes()),
+        )
+        _cache().commit()
+        _sem_add(model_id, probe, vec)
+
+def _invoke_titan(text: str, model_id: str) -> np.ndarray:
     """
-    if not text:
-        return []
+    Single embedding lookup. Order: exact on-disk cache, then semantic
+    near-duplicate cache (hashed-trigram probe, cosine >= threshold),
+    then Bedrock. Returns an L2-normalized float32 ndarray.
+    """
+    cached = _cache_get(text, model_id)
+    if cached is not None:
+        return cached
+
+    probe = _probe_vec(text)
+    near = _sem_get(model_id, probe)
+    if near is not None:
+        return near
 
-    model_id = model_id or Config().bedrock_embed_model
     body = json.dumps({"inputText": text})
 
     try:
         # Call Bedrock embeddings
-        resp = _client().invoke_model(
+        resp = bedrock_runtime().invoke_model(
             modelId=model_id,
             body=body,
             contentType="application/json",
@@ -50,10 +132,58 @@ def embed_text(text: str, model_id: str | None = None) -> list[float]:
         payload = json.loads(resp["body"].read())
 
         # Titan sometimes uses `embedding` or `vector` keys depending on version
-        vec = payload.get("embedding") or payload.get("vector")
-        if not isinstance(vec, list):
+        raw = payload.get("embedding") or payload.get("vector")
+        if not isinstance(raw, list):
             raise ValueError(f"Unexpected embedding payload: {payload}")
+        # float32 + unit norm: 7x smaller than boxed floats, and cosine
+        # space downstream reduces to plain dot products
+        vec = np.asarray(raw, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if norm:
+            vec /= norm
+        _cache_put(text, model_id, vec, probe)
         return vec
 
     except (BotoCoreError, ClientError, ValueError) as e:
         raise RuntimeError(f"Bedrock embedding failed: {e}")
+
+_EMPTY_VEC = np.zeros(0, dtype=np.float32)
+
+def embed_texts(texts: list[str], model_id: str | None = None) -> list[np.ndarray]:
+    """
+    Generate embedding vectors for a batch of texts using Titan.
+
+    Titan v2 embeds one input per request, so each text still costs one
+    Bedrock round-trip — but the calls are network-bound (~200-400ms each),
+    so we issue them from a bounded thread pool (EMBED_CONCURRENCY workers,
+    default 8). `executor.map` preserves input order for the caller's zips;
+    adaptive retries on the client absorb throttling from the fan-out.
+
+    Args:
+        texts: Input texts (empty entries yield empty vectors)
+        model_id: Optional override; defaults to Config().bedrock_embed_model
+
+    Returns:
+        A list of L2-normalized float32 ndarrays, one per input, in order
+        (vectors stay ndarray until the JSON boundary in VectorStore).
+        Titan v2 length is typically 1536.
+    """
+    cfg = Config()
+    model_id = model_id or cfg.bedrock_embed_model
+    if len(texts) <= 1:
+        return [_invoke_titan(t, model_id) if t else _EMPTY_VEC for t in texts]
+    embed_one = partial(_invoke_titan, model_id=model_id)
+    with ThreadPoolExecutor(max_workers=cfg.embed_concurrency) as ex:
+        return list(ex.map(lambda t: embed_one(t) if t else _EMPTY_VEC, texts))
+
+def embed_text(text: str, model_id: str | None = None) -> np.ndarray:
+    """
+    Generate an embedding vector for a single text using Titan.
+
+    Thin wrapper around `embed_texts` for the query path.
+
+    Example:
+        >>> embed_text("Hello world")[:5]
+        [0.0123, -0.0456, ...]
+    """
+    return embed_texts([text], model_id=model_id)[0]
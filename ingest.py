@@ -11,20 +11,22 @@ What it does:
 Tip: For large docs, consider the async Textract API (StartDocumentAnalysis).
 """
 from __future__ import annotations
-import boto3
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from typing import List
+import aws_clients
 from config import Config
-from embeddings import embed_text
+from embeddings import embed_texts
 from vector_store import VectorStore
-from utils.textract_parser import analyze_document, extract_lines, extract_tables_as_markdown, extract_figures
-from utils.chunk_joiner import attach_context_to_tables
+from utils.textract_parser import analyze_document, analyze_document_async, partition_blocks, tables_to_markdown
+from utils.chunk_joiner import attach_context_to_tables, group_line_boxes
 from utils.caption_extractor import figure_captions
 
 cfg = Config()
 
 def list_pdf_keys(bucket: str, prefix: str) -> List[str]:
     """Return all S3 keys under prefix that end with .pdf (case-insensitive)."""
-    s3 = boto3.client('s3')
+    s3 = aws_clients.s3()
     keys = []
     paginator = s3.get_paginator('list_objects_v2')
     for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
@@ -34,45 +36,56 @@ def list_pdf_keys(bucket: str, prefix: str) -> List[str]:
                 keys.append(key)
     return keys
 
-def ingest_document(vs: VectorStore, bucket: str, key: str) -> None:
+def ingest_document(vs: VectorStore, bucket: str, key: str, resp: dict | None = None) -> None:
     """Analyze one PDF and write text/table/image vectors to OpenSearch."""
     print(f"[INGEST] Analyzing s3://{bucket}/{key}")
-    resp = analyze_document(bucket, key)
-    blocks = resp['Blocks']
+    if resp is None:
+        resp = analyze_document(bucket, key)
+    # One traversal of the (potentially huge) block list yields everything
+    # the three modality passes need, including the id->block map.
+    block_map, lines, table_blocks, figs = partition_blocks(resp['Blocks'])
+    # Per-page line index (box matrices + texts), built once and shared by
+    # the table-context and figure-caption helpers
+    lines_by_page = group_line_boxes(lines)
 
     # --- TEXT: naïve approach, index each LINE (you may group by page/heading) ---
-    lines = extract_lines(blocks)
+    # Collect everything first, then embed in one batched pass: per-item
+    # embed_text calls cost a full Bedrock round-trip each (~200-400ms).
+    texts, doc_ids, metas = [], [], []
     for i, ln in enumerate(lines):
         text = ln.get('Text', '').strip()
         if not text:
             continue
-        emb = embed_text(text)
-        doc_id = f"{key}::line::{i}"
-        vs.upsert(cfg.index_text, doc_id, text, emb, 'text', {
-            'source': key, 'page': ln.get('Page')
-        })
+        texts.append(text)
+        doc_ids.append(f"{key}::line::{i}")
+        metas.append({'source': key, 'page': ln.get('Page')})
+    # Dedup identical lines (headers/footers repeat on every page): embed
+    # each distinct text once, then fan the vector back out per occurrence.
+    unique_texts = list(dict.fromkeys(texts))
+    text_to_vec = dict(zip(unique_texts, embed_texts(unique_texts)))
+    # Generators keep bulk_upsert streaming: no second list of all docs in RAM
+    vs.bulk_upsert(cfg.index_text, (
+        (doc_id, text, text_to_vec[text], 'text', meta)
+        for doc_id, text, meta in zip(doc_ids, texts, metas)
+    ))
 
     # --- TABLES: convert to Markdown and attach nearby context ---
-    tables = extract_tables_as_markdown(blocks)
-    table_chunks = attach_context_to_tables(lines, tables)
-    for i, ch in enumerate(table_chunks):
-        content_for_embed = f"{ch['content']}\nContext: {ch['context']}"
-        emb = embed_text(content_for_embed)
-        doc_id = f"{key}::table::{i}"
-        vs.upsert(cfg.index_table, doc_id, ch['content'], emb, 'table', {
-            'source': key, **ch['metadata']
-        })
+    tables = tables_to_markdown(block_map, table_blocks)
+    table_chunks = attach_context_to_tables(lines_by_page, tables)
+    embs = embed_texts([f"{ch['content']}\nContext: {ch['context']}" for ch in table_chunks])
+    vs.bulk_upsert(cfg.index_table, (
+        (f"{key}::table::{i}", ch['content'], emb, 'table', {'source': key, **ch['metadata']})
+        for i, (ch, emb) in enumerate(zip(table_chunks, embs))
+    ))
 
     # --- IMAGES: derive a caption from nearby lines, embed caption ---
-    figs = extract_figures(blocks)
-    caps = figure_captions(lines, figs)
-    for i, ch in enumerate(caps):
-        caption = ch['metadata'].get('caption') or 'Figure'
-        emb = embed_text(caption)
-        doc_id = f"{key}::image::{i}"
-        vs.upsert(cfg.index_image, doc_id, caption, emb, 'image', {
-            'source': key, **ch['metadata']
-        })
+    caps = figure_captions(lines_by_page, figs)
+    captions = [ch['metadata'].get('caption') or 'Figure' for ch in caps]
+    embs = embed_texts(captions)
+    vs.bulk_upsert(cfg.index_image, (
+        (f"{key}::image::{i}", caption, emb, 'image', {'source': key, **ch['metadata']})
+        for i, (ch, caption, emb) in enumerate(zip(caps, captions, embs))
+    ))
 
 def main():
     if not cfg.s3_bucket:
@@ -82,8 +95,17 @@ def main():
     if not keys:
         print("No PDFs found to ingest.")
         return
-    for key in keys:
-        ingest_document(vs, cfg.s3_bucket, key)
+    # Fan Textract jobs out via the async API so PDFs are analyzed
+    # concurrently; indexing happens as each analysis completes, in order.
+    analyze = partial(analyze_document_async,
+                      cfg.s3_bucket,
+                      sns_topic_arn=cfg.textract_sns_topic_arn,
+                      role_arn=cfg.textract_role_arn)
+    with ThreadPoolExecutor(max_workers=cfg.textract_concurrency) as ex:
+        for key, resp in zip(keys, ex.map(analyze, keys)):
+            ingest_document(vs, cfg.s3_bucket, key, resp)
+    # Bulk writes skip per-doc refresh; make everything searchable once here
+    vs.refresh(cfg.index_text, cfg.index_table, cfg.index_image)
     print("Ingestion complete.")
 
 if __name__ == "__main__":
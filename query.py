@@ -9,35 +9,49 @@ Steps:
   4) Ask Claude 3 Sonnet on Bedrock with a strict, grounded prompt
 """
 from __future__ import annotations
-import argparse, json, boto3
+import argparse, functools, json
 from typing import List
+import numpy as np
+from aws_clients import bedrock_runtime
 from config import Config
 from embeddings import embed_text
 from vector_store import VectorStore
 
 cfg = Config()
-bedrock = boto3.client("bedrock-runtime", region_name=cfg.region)
+# Pre-warm the shared client at import so the first query doesn't pay
+# session/TLS setup (matters for Lambda-style short-lived workers)
+bedrock = bedrock_runtime()
 
-def knn_topk(vs: VectorStore, vector: List[float], k: int = 4) -> list[dict]:
+def knn_topk(vs: VectorStore, vector: "np.ndarray | List[float]", k: int = 4) -> list[dict]:
     """Retrieve top‑k for each modality and return a flat list with metadata."""
-    hits_all = []
-    for index, modality in [
+    indexes = [
         (cfg.index_text, 'text'),
         (cfg.index_table, 'table'),
         (cfg.index_image, 'image'),
-    ]:
-        hits = vs.knn(index, vector, k)
+    ]
+    # One msearch round-trip instead of three sequential searches
+    per_index = vs.msearch_knn([(index, vector, k) for index, _ in indexes])
+    contents, modalities, metas, scores = [], [], [], []
+    for (_, modality), hits in zip(indexes, per_index):
         for h in hits:
             src = h.get('_source', {})
-            hits_all.append({
-                'modality': modality,
-                'content': src.get('content', ''),
-                'metadata': src.get('metadata', {}),
-                'score': h.get('_score', 0.0)
-            })
-    # Optional: sort by score first, with a slight preference for tables
-    hits_all.sort(key=lambda x: (round(x['score'], 4), 1 if x['modality']=='table' else 0), reverse=True)
-    return hits_all
+            contents.append(src.get('content', ''))
+            modalities.append(modality)
+            metas.append(src.get('metadata', {}))
+            scores.append(h.get('_score', 0.0))
+    if not scores:
+        return []
+    # Sort by score (rounded to 4 decimals) with a slight preference for
+    # tables on ties — one vectorized key instead of a Python lambda per hit
+    boosted = np.round(np.asarray(scores, dtype=np.float64), 4)
+    boosted += (np.array(modalities) == 'table') * 1e-6
+    order = np.argsort(-boosted, kind='stable')
+    return [{
+        'modality': modalities[i],
+        'content': contents[i],
+        'metadata': metas[i],
+        'score': float(scores[i]),
+    } for i in order]
 
 def build_context(chunks: list[dict]) -> str:
     """Build a readable, grounded context string for the LLM."""
@@ -53,13 +67,23 @@ def build_context(chunks: list[dict]) -> str:
             parts.append(f"[TEXT]\n{ch['content'][:1200]}\n(Source: {src} p.{page})\n")
     return "\n".join(parts)
 
+@functools.lru_cache(maxsize=1)
 def load_prompt_template() -> str:
     with open('prompt_templates/claude_prompt.txt', 'r', encoding='utf-8') as f:
         return f.read()
 
+@functools.lru_cache(maxsize=1)
+def _prompt_segments() -> tuple[str, str, str]:
+    """Template split once around {{CONTEXT}} / {{QUESTION}}, so each query
+    joins five strings instead of re-reading the file and scanning it twice."""
+    pre, rest = load_prompt_template().split("{{CONTEXT}}", 1)
+    mid, post = rest.split("{{QUESTION}}", 1)
+    return pre, mid, post
+
 def ask_claude(question: str, context: str) -> str:
     """Send the grounded prompt to Claude via Bedrock and return the answer text."""
-    prompt = load_prompt_template().replace("{{CONTEXT}}", context).replace("{{QUESTION}}", question)
+    pre, mid, post = _prompt_segments()
+    prompt = ''.join((pre, context, mid, question, post))
     body = json.dumps({
         "messages": [
             {"role": "user", "content": [{"type": "text", "text": prompt}]}
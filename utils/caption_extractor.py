@@ -3,24 +3,32 @@ caption_extractor.py
 Heuristic caption finder for FIGURE blocks using nearest line above/below.
 """
 from __future__ import annotations
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 
-def figure_captions(lines: List[dict], figures: List[dict]) -> list[dict]:
-    """Return a list of {'modality', 'content', 'metadata'} dicts for images."""
+import numpy as np
+
+def figure_captions(pages: Dict[Any, Tuple[np.ndarray, List[str]]],
+                    figures: List[dict]) -> list[dict]:
+    """
+    Return a list of {'modality', 'content', 'metadata'} dicts for images.
+
+    `pages` is the per-page line index from `chunk_joiner.group_line_boxes`,
+    built once by the caller; the nearest-line scan is a single argmin over
+    that page's box matrix.
+    """
     out = []
     for fig in figures:
         fbox = fig['Geometry']['BoundingBox']
-        same_page = [ln for ln in lines if ln.get('Page') == fig.get('Page')]
-        best = None
-        best_dist = 1e9
-        for ln in same_page:
-            lbox = ln['Geometry']['BoundingBox']
+        boxes, texts = pages.get(fig.get('Page'), (np.empty((0, 4), dtype=np.float32), []))
+        if len(boxes):
+            tops = boxes[:, 1]
+            bottoms = boxes[:, 1] + boxes[:, 3]
             # Distance to top or bottom edge of the figure box
-            dist = min(abs((lbox['Top']+lbox['Height']) - fbox['Top']),
-                       abs(lbox['Top'] - (fbox['Top']+fbox['Height'])))
-            if dist < best_dist:
-                best, best_dist = ln, dist
-        caption = best.get('Text', '') if best else ''
+            dist = np.minimum(np.abs(bottoms - fbox['Top']),
+                              np.abs(tops - (fbox['Top'] + fbox['Height'])))
+            caption = texts[int(dist.argmin())]
+        else:
+            caption = ''
         out.append({
             'modality': 'image',
             'content': caption or 'Figure',
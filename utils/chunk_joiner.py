@@ -6,12 +6,19 @@ In a production system, you might use page-level headings, section numbers,
 or learned heuristics. Here we show a simple geometric proximity approach.
 """
 from __future__ import annotations
-from typing import List, Dict, Any
+from collections import defaultdict
+from typing import Dict, Any, List, Tuple
 
-def iou(a: Dict[str, Any], b: Dict[str, Any]) -> float:
-    """Compute Intersection-over-Union between two [0..1] bounding boxes."""
-    ax, ay, aw, ah = a['Left'], a['Top'], a['Width'], a['Height']
-    bx, by, bw, bh = b['Left'], b['Top'], b['Width'], b['Height']
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the pure-Python helper is fine
+    njit = None
+
+def _iou_scalar(ax: float, ay: float, aw: float, ah: float,
+                bx: float, by: float, bw: float, bh: float) -> float:
+    """IoU on unpacked box fields (plain floats, so numba can compile it)."""
     ax2, ay2 = ax+aw, ay+ah
     bx2, by2 = bx+bw, by+bh
     inter_w = max(0.0, min(ax2, bx2) - max(ax, bx))
@@ -20,20 +27,52 @@ def iou(a: Dict[str, Any], b: Dict[str, Any]) -> float:
     union = aw*ah + bw*bh - inter
     return inter/union if union else 0.0
 
-def attach_context_to_tables(lines: List[dict], tables: List[tuple]) -> List[Dict[str, Any]]:
-    """Attach nearby line text to each table as `context` (very simple heuristic)."""
+if njit is not None:
+    _iou_scalar = njit(cache=True)(_iou_scalar)
+
+def iou(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+    """Compute Intersection-over-Union between two [0..1] bounding boxes."""
+    return _iou_scalar(a['Left'], a['Top'], a['Width'], a['Height'],
+                       b['Left'], b['Top'], b['Width'], b['Height'])
+
+def group_line_boxes(lines: List[dict]) -> Dict[Any, Tuple[np.ndarray, List[str]]]:
+    """Group lines by page into (boxes (L,4) Left/Top/Width/Height, texts)."""
+    by_page: Dict[Any, List[dict]] = defaultdict(list)
+    for ln in lines:
+        by_page[ln.get('Page')].append(ln)
+    out = {}
+    for page, grp in by_page.items():
+        boxes = np.array(
+            [[ln['Geometry']['BoundingBox'][k] for k in ('Left', 'Top', 'Width', 'Height')]
+             for ln in grp],
+            dtype=np.float32,
+        )
+        out[page] = (boxes, [ln.get('Text', '') for ln in grp])
+    return out
+
+def attach_context_to_tables(pages: Dict[Any, Tuple[np.ndarray, List[str]]],
+                             tables: List[tuple]) -> List[Dict[str, Any]]:
+    """
+    Attach nearby line text to each table as `context` (very simple heuristic).
+
+    `pages` is the per-page line index from `group_line_boxes`; the caller
+    builds it once and shares it with `figure_captions`. The IoU/proximity
+    test runs vectorized over all lines of a page per table.
+    """
     chunks: List[Dict[str, Any]] = []
     for md, tbl in tables:
         tbox = tbl['Geometry']['BoundingBox']
-        nearby = []
-        for ln in lines:
-            if ln.get('Page') != tbl.get('Page'):
-                continue
-            lbox = ln['Geometry']['BoundingBox']
+        boxes, texts = pages.get(tbl.get('Page'), (np.empty((0, 4), dtype=np.float32), []))
+        if len(boxes):
+            ax, ay, aw, ah = tbox['Left'], tbox['Top'], tbox['Width'], tbox['Height']
+            inter_w = np.maximum(0.0, np.minimum(ax + aw, boxes[:, 0] + boxes[:, 2]) - np.maximum(ax, boxes[:, 0]))
+            inter_h = np.maximum(0.0, np.minimum(ay + ah, boxes[:, 1] + boxes[:, 3]) - np.maximum(ay, boxes[:, 1]))
+            inter = inter_w * inter_h
             # Either overlapping, or very close above the table
-            proximity = iou(tbox, lbox)
-            if proximity > 0.0 or abs((lbox['Top'] + lbox['Height']) - tbox['Top']) < 0.05:
-                nearby.append(ln.get('Text', ''))
+            mask = (inter > 0.0) | (np.abs((boxes[:, 1] + boxes[:, 3]) - ay) < 0.05)
+            nearby = [texts[i] for i in np.flatnonzero(mask)]
+        else:
+            nearby = []
         context = ' '.join(nearby[-5:])  # last few lines often capture captions/lead-in
         chunks.append({
             'modality': 'table',
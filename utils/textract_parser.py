@@ -3,27 +3,100 @@ textract_parser.py
 Utilities to call Amazon Textract and convert responses into usable chunks.
 
 Functions:
-  • analyze_document(bucket, key)  -> raw Textract response
-  • extract_lines(blocks)          -> LINE blocks
-  • extract_tables_as_markdown()   -> Markdown tables for quick LLM rendering
-  • extract_figures(blocks)        -> FIGURE blocks (if present)
+  • analyze_document(bucket, key)        -> raw Textract response (sync API)
+  • analyze_document_async(bucket, key)  -> same shape, via StartDocumentAnalysis
+  • extract_lines(blocks)                -> LINE blocks
+  • partition_blocks(blocks)             -> (block_map, lines, tables, figures) in one pass
+  • extract_tables_as_markdown()         -> Markdown tables for quick LLM rendering
+  • tables_to_markdown(block_map, tbls)  -> same, for pre-partitioned blocks
+  • extract_figures(blocks)              -> FIGURE blocks (if present)
 """
 from __future__ import annotations
-import boto3
+import time
 from typing import List, Dict, Tuple
 
+from aws_clients import textract
+from config import Config
+
 def analyze_document(s3_bucket: str, s3_key: str) -> dict:
     """Run Textract on an S3 object and return raw JSON blocks."""
-    textract = boto3.client('textract')
-    return textract.analyze_document(
+    return textract().analyze_document(
         Document={'S3Object': {'Bucket': s3_bucket, 'Name': s3_key}},
-        FeatureTypes=['TABLES', 'FORMS']
+        FeatureTypes=list(Config().textract_features)
     )
 
+def analyze_document_async(s3_bucket: str, s3_key: str,
+                           sns_topic_arn: str | None = None,
+                           role_arn: str | None = None,
+                           poll_interval: float = 5.0) -> dict:
+    """
+    Run Textract via the async StartDocumentAnalysis API and return a dict
+    with all 'Blocks', shaped like `analyze_document`'s response.
+
+    Unlike the sync API this doesn't block a connection for the whole run,
+    so several documents can be analyzed concurrently. When an SNS topic and
+    role are supplied Textract publishes job completion there (preferred at
+    scale); we still poll GetDocumentAnalysis here to collect the result,
+    then paginate NextToken until every block is fetched.
+    """
+    kwargs = {
+        'DocumentLocation': {'S3Object': {'Bucket': s3_bucket, 'Name': s3_key}},
+        'FeatureTypes': list(Config().textract_features),
+    }
+    if sns_topic_arn and role_arn:
+        kwargs['NotificationChannel'] = {'SNSTopicArn': sns_topic_arn, 'RoleArn': role_arn}
+    job_id = textract().start_document_analysis(**kwargs)['JobId']
+
+    while True:
+        resp = textract().get_document_analysis(JobId=job_id, MaxResults=1000)
+        status = resp.get('JobStatus')
+        if status == 'SUCCEEDED':
+            break
+        if status in ('FAILED', 'PARTIAL_SUCCESS'):
+            raise RuntimeError(f"Textract job {job_id} for {s3_key} ended with {status}")
+        time.sleep(poll_interval)
+
+    blocks = list(resp.get('Blocks', []))
+    while resp.get('NextToken'):
+        resp = textract().get_document_analysis(
+            JobId=job_id, MaxResults=1000, NextToken=resp['NextToken'])
+        blocks.extend(resp.get('Blocks', []))
+    return {'Blocks': blocks}
+
 def extract_lines(blocks: List[dict]) -> List[dict]:
     """Extract only LINE blocks from a Textract response."""
     return [b for b in blocks if b.get('BlockType') == 'LINE']
 
+def partition_blocks(blocks: List[dict]) -> Tuple[Dict[str, dict], List[dict], List[dict], List[dict]]:
+    """
+    Split a Textract block list into (block_map, lines, tables, figures)
+    in a single traversal, instead of one full pass per block type plus a
+    separate id-map build. Large PDFs yield tens of thousands of blocks,
+    so the extra passes are pure overhead.
+    """
+    block_map: Dict[str, dict] = {}
+    lines: List[dict] = []
+    tables: List[dict] = []
+    figures: List[dict] = []
+    for b in blocks:
+        bid = b.get('Id')
+        if bid:
+            block_map[bid] = b
+        bt = b.get('BlockType')
+        if bt == 'LINE':
+            lines.append(b)
+        elif bt == 'TABLE':
+            tables.append(b)
+        elif bt == 'FIGURE':
+            figures.append(b)
+    return block_map, lines, tables, figures
+
+def _children(block: dict):
+    """Yield the ids of a block's CHILD relationships."""
+    for r in block.get('Relationships') or ():
+        if r.get('Type') == 'CHILD':
+            yield from r.get('Ids') or ()
+
 def extract_tables_as_markdown(blocks: List[dict]) -> List[Tuple[str, dict]]:
     """
     Convert Textract TABLE blocks into Markdown for easy prompting.
@@ -31,48 +104,43 @@ def extract_tables_as_markdown(blocks: List[dict]) -> List[Tuple[str, dict]]:
     Returns:
         List[(markdown_table_str, table_block)]
     """
+    block_map, _, table_blocks, _ = partition_blocks(blocks)
+    return tables_to_markdown(block_map, table_blocks)
+
+def tables_to_markdown(block_map: Dict[str, dict], table_blocks: List[dict]) -> List[Tuple[str, dict]]:
+    """
+    Render already-partitioned TABLE blocks as Markdown, reusing the caller's
+    block_map instead of rebuilding it per call.
+    """
     tables = []
-    block_map = {b['Id']: b for b in blocks if 'Id' in b}
+    for b in table_blocks:
+        # First pass: collect cell texts (joined once, no += string building)
+        # while tracking the grid extent.
+        cells = []
+        max_row = max_col = 0
+        for cid in _children(b):
+            cell = block_map.get(cid)
+            if not cell or cell.get('BlockType') != 'CELL':
+                continue
+            row = cell.get('RowIndex', 1)
+            col = cell.get('ColumnIndex', 1)
+            words = [
+                w['Text'] for wid in _children(cell)
+                if (w := block_map.get(wid)) and w.get('BlockType') == 'WORD' and 'Text' in w
+            ]
+            cells.append((row, col, ' '.join(words)))
+            max_row = max(max_row, row)
+            max_col = max(max_col, col)
 
-    # Iterate all blocks, find TABLEs, then traverse their CELL children
-    for b in blocks:
-        if b.get('BlockType') != 'TABLE':
-            continue
+        # Second pass: fill a preallocated grid, then join once
+        grid = [[''] * max_col for _ in range(max_row)]
+        for row, col, text in cells:
+            grid[row - 1][col - 1] = text
+        rows = ['| ' + ' | '.join(row_vals) + ' |' for row_vals in grid]
+        if rows:
+            rows.insert(1, '|' + '|'.join([' --- '] * max_col) + '|')
 
-        cell_text = {}
-        for r in b.get('Relationships', []) or []:
-            if r.get('Type') != 'CHILD':
-                continue
-            for cid in r.get('Ids', []):
-                cell = block_map.get(cid)
-                if not cell or cell.get('BlockType') != 'CELL':
-                    continue
-
-                row = cell.get('RowIndex', 1)
-                col = cell.get('ColumnIndex', 1)
-
-                # Collect all WORD children for this cell
-                text = ''
-                for rr in cell.get('Relationships', []) or []:
-                    if rr.get('Type') != 'CHILD':
-                        continue
-                    for wid in rr.get('Ids', []):
-                        w = block_map.get(wid)
-                        if w and w.get('BlockType') == 'WORD':
-                            text += (w.get('Text', '') + ' ')
-                cell_text[(row, col)] = text.strip()
-
-        # Build a simple Markdown table
-        max_row = max((r for r, _ in cell_text.keys()), default=0)
-        max_col = max((c for _, c in cell_text.keys()), default=0)
-        lines = []
-        for r in range(1, max_row + 1):
-            row_vals = [cell_text.get((r, c), '') for c in range(1, max_col + 1)]
-            lines.append('| ' + ' | '.join(row_vals) + ' |')
-            if r == 1:
-                lines.append('|' + '|'.join([' --- ']*max_col) + '|')
-
-        md = '\n'.join(lines)
+        md = '\n'.join(rows)
         tables.append((md, b))
     return tables
 
@@ -17,8 +17,10 @@ Example document stored in OpenSearch:
 }
 """
 from __future__ import annotations
+import os
 from typing import Any, Dict, List
-from opensearchpy import OpenSearch, RequestsHttpConnection
+import numpy as np
+from opensearchpy import OpenSearch, RequestsHttpConnection, helpers
 from requests_aws4auth import AWS4Auth
 import boto3
 from config import Config
@@ -26,6 +28,11 @@ from config import Config
 class VectorStore:
     """High-level helper around an OpenSearch client for vector search."""
 
+    # Indexes already verified/created by this process; each check is an
+    # HTTPS round-trip, so short-lived workers shouldn't repeat it per
+    # VectorStore instance
+    _ENSURED: set[str] = set()
+
     def __init__(self, cfg: Config | None = None) -> None:
         self.cfg = cfg or Config()
         self.client = self._connect()
@@ -65,42 +72,151 @@ class VectorStore:
             )
 
     def _ensure_index(self, name: str) -> None:
-        """Create an index with `knn_vector` mapping if it doesn't exist."""
+        """
+        Create an index with `knn_vector` mapping if it doesn't exist.
+
+        The result is cached per process, and OPENSEARCH_SKIP_ENSURE=1
+        skips the check entirely — set it on query-path Lambdas whose
+        indexes are pre-created at deploy time, saving 3 round-trips per
+        cold start.
+        """
+        if name in VectorStore._ENSURED or os.getenv("OPENSEARCH_SKIP_ENSURE") == "1":
+            return
         if self.client.indices.exists(index=name):
+            VectorStore._ENSURED.add(name)
             return
 
         # Titan v2 vector length is 1536; update if you switch models.
         mapping = {
-            "settings": {"index": {"number_of_shards": 1, "number_of_replicas": 0}},
+            "settings": {
+                "index": {"number_of_shards": 1, "number_of_replicas": 0, "knn": True}
+            },
             "mappings": {
                 "properties": {
                     "content":   {"type": "text"},
                     "modality":  {"type": "keyword"},
                     "metadata":  {"type": "object", "enabled": True},
-                    "embedding": {"type": "knn_vector", "dimension": 1536},
+                    "embedding": {
+                        "type": "knn_vector",
+                        "dimension": 1536,
+                        "space_type": "cosinesimil",
+                        "method": {
+                            "name": "hnsw",
+                            "engine": "faiss",
+                            "parameters": {"ef_construction": 256, "m": 16},
+                        },
+                        # byte vectors are quantized client-side (see
+                        # _quantize); float vectors instead rely on
+                        # on_disk/compression, where Faiss quantizes
+                        # server-side and rescores
+                        **({"data_type": "byte"} if self.cfg.knn_data_type == "byte" else
+                           {"mode": self.cfg.knn_mode,
+                            "compression_level": self.cfg.knn_compression}),
+                    },
                 }
             }
         }
         self.client.indices.create(index=name, body=mapping)
+        VectorStore._ENSURED.add(name)
+
+    def _quantize(self, vector) -> tuple[list, float]:
+        """
+        Symmetric int8 quantization: q = round(v / s) with s = max|v| / 127.
+        Accepts an ndarray or list; returns (plain-list for JSON, scale).
+        Full-precision indexes get the float32 values back unquantized.
+        """
+        v = np.asarray(vector, dtype=np.float32)
+        if v.size == 0:
+            return [], 1.0
+        if self.cfg.knn_data_type != "byte":
+            return v.tolist(), 1.0
+        s = float(np.abs(v).max() / 127.0) or 1.0
+        q = np.clip(np.round(v / s), -127, 127).astype(np.int8)
+        return q.tolist(), s
 
     def upsert(self,
                index: str,
                doc_id: str,
                content: str,
-               embedding: List[float],
+               embedding: "np.ndarray | List[float]",
                modality: str,
                metadata: Dict[str, Any]) -> None:
         """Insert or update a document with its vector and metadata."""
+        q, scale = self._quantize(embedding)
         body = {
             "content": content,
-            "embedding": embedding,
+            "embedding": q,
+            "scale": scale,
             "modality": modality,
             "metadata": metadata,
         }
         self.client.index(index=index, id=doc_id, body=body, refresh=True)
 
-    def knn(self, index: str, vector: List[float], k: int = 5) -> list[dict]:
+    def bulk_upsert(self, index: str, docs) -> None:
+        """
+        Bulk-index an iterable of (doc_id, content, embedding, modality,
+        metadata) tuples, without forcing a refresh per document. Call
+        `refresh()` once after ingest so the writes become searchable.
+
+        `docs` may be a generator: actions are streamed to _bulk chunk by
+        chunk, so peak memory is one chunk of documents rather than the
+        whole batch.
+        """
+        def actions():
+            for doc_id, content, embedding, modality, metadata in docs:
+                q, scale = self._quantize(embedding)
+                yield {
+                    "_op_type": "index",
+                    "_index": index,
+                    "_id": doc_id,
+                    "_source": {
+                        "content": content,
+                        "embedding": q,
+                        "scale": scale,
+                        "modality": modality,
+                        "metadata": metadata,
+                    },
+                }
+
+        for ok, item in helpers.streaming_bulk(
+            self.client, actions(),
+            chunk_size=200,
+            max_chunk_bytes=10 * 1024 * 1024,
+            request_timeout=120,
+        ):
+            if not ok:
+                raise RuntimeError(f"Bulk indexing into {index} failed: {item}")
+
+    def refresh(self, *indexes: str) -> None:
+        """Force a segment refresh so recently bulk-indexed docs are searchable."""
+        for index in indexes:
+            self.client.indices.refresh(index=index)
+
+    def knn(self, index: str, vector: "np.ndarray | List[float]", k: int = 5) -> list[dict]:
         """Return top‑k nearest neighbors using OpenSearch KNN query."""
-        q = {"size": k, "query": {"knn": {"embedding": {"vector": vector, "k": k}}}}
+        qvec, _ = self._quantize(vector)
+        q = {"size": k, "query": {"knn": {"embedding": {"vector": qvec, "k": k}}}}
         res = self.client.search(index=index, body=q)
         return [hit for hit in res.get("hits", {}).get("hits", [])]
+
+    def msearch_knn(self, specs: List[tuple]) -> list[list[dict]]:
+        """
+        Run several KNN searches in a single _msearch round-trip.
+
+        Args:
+            specs: list of (index, vector, k) tuples
+
+        Returns:
+            One hit list per spec, in order — same shape as calling `knn`
+            once per spec, but paying one HTTP round-trip instead of len(specs).
+        """
+        body = []
+        for index, vector, k in specs:
+            qvec, _ = self._quantize(vector)
+            body.append({"index": index})
+            body.append({"size": k, "query": {"knn": {"embedding": {"vector": qvec, "k": k}}}})
+        res = self.client.msearch(body=body)
+        return [
+            [hit for hit in resp.get("hits", {}).get("hits", [])]
+            for resp in res.get("responses", [])
+        ]